@@ -1,8 +1,39 @@
-from flask import Flask, request, jsonify
-from newspaper import Article
+import json
+import os
+
+import requests
+from flask import Flask, Response, request, jsonify, stream_with_context
+
+import metrics
+
+from batch import BatchParser
+from corpus import NotRecorded, replay_corpus
+from fetch import BudgetExceeded, fetch_page
+from pipeline import (MAX_HAVE_INGREDIENTS, MAX_SEARCH_RESULTS, cached_parse, parse_cache_from_env, prewarm,
+                      recipe_store_from_env)
 
 app = Flask(__name__)
 
+parse_cache = parse_cache_from_env()
+# With a replay corpus configured, pages come from disk instead of the network
+replay = replay_corpus()
+fetch = replay.fetch_page if replay is not None else fetch_page
+batch_parser = BatchParser(
+    parse_cache,
+    fetch_workers=int(os.environ.get('RECIPEASY_BATCH_FETCH_WORKERS', 16)),
+    per_host=int(os.environ.get('RECIPEASY_BATCH_PER_HOST', 4)),
+    fetch=fetch,
+)
+recipe_store = recipe_store_from_env()
+
+MAX_BATCH_URLS = 500
+
+# Load newspaper now rather than on the first request that needs it; batch
+# parse workers are forked later and start warm too
+if os.environ.get('RECIPEASY_PREWARM') == '1':
+    prewarm()
+
+
 @app.route('/parse', methods=['POST'])
 def parse_recipe():
     data = request.get_json()
@@ -12,25 +43,82 @@ def parse_recipe():
         return jsonify({'error': 'No URL provided'}), 400
 
     try:
-        article = Article(url)
-        article.download()
-        article.parse()
-        text = article.text
-
-        # Very simple placeholder parsing
-        lines = [line.strip() for line in text.split('\n') if line.strip()]
-        title = article.title
-        ingredients = [line for line in lines if 'cup' in line.lower() or 'tsp' in line.lower() or 'tablespoon' in line.lower()]
-        steps = [line for line in lines if line not in ingredients][:10]  # first 10 lines as steps
-
-        return jsonify({
-            'title': title,
-            'ingredients': ingredients,
-            'steps': steps
-        })
+        if request.args.get('profile') == '1':
+            result, profile = metrics.profile_call(lambda: cached_parse(parse_cache, url, fetch))
+            result['profile'] = profile
+        else:
+            result = cached_parse(parse_cache, url, fetch)
+        recipe_store.add(url, result)
+        return jsonify(result)
+
+    except BudgetExceeded as e:
+        return jsonify({'error': str(e)}), e.status
+
+    except NotRecorded as e:
+        return jsonify({'error': str(e)}), 404
+
+    except requests.Timeout as e:
+        return jsonify({'error': 'Upstream timed out: %s' % e}), 504
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+
+@app.route('/parse/batch', methods=['POST'])
+def parse_batch():
+    data = request.get_json()
+    urls = data.get('urls')
+
+    if not urls or not isinstance(urls, list):
+        return jsonify({'error': 'No URLs provided'}), 400
+    if len(urls) > MAX_BATCH_URLS:
+        return jsonify({'error': 'At most %d URLs per batch' % MAX_BATCH_URLS}), 400
+
+    def lines():
+        # One JSON object per line, in the order the URLs finish
+        for result in batch_parser.run(urls):
+            if 'error' not in result:
+                recipe_store.add(result['url'], result)
+            yield json.dumps(result) + '\n'
+
+    return Response(stream_with_context(lines()), mimetype='application/x-ndjson')
+
+
+def search_limit():
+    return max(1, min(request.args.get('limit', 20, type=int), MAX_SEARCH_RESULTS))
+
+
+@app.route('/recipes/search', methods=['GET'])
+def search_recipes():
+    query = request.args.get('q', '').strip()
+
+    if not query:
+        return jsonify({'error': 'No query provided'}), 400
+
+    return jsonify({'results': recipe_store.search(query, search_limit())})
+
+
+@app.route('/recipes/by-ingredients', methods=['GET'])
+def recipes_by_ingredients():
+    have = [item.strip() for item in request.args.get('have', '').split(',') if item.strip()]
+
+    if not have:
+        return jsonify({'error': 'No ingredients provided'}), 400
+    if len(have) > MAX_HAVE_INGREDIENTS:
+        return jsonify({'error': 'At most %d ingredients per query' % MAX_HAVE_INGREDIENTS}), 400
+
+    return jsonify({'results': recipe_store.by_ingredients(have, search_limit())})
+
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(parse_cache.stats())
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.render(parse_cache.stats()), mimetype='text/plain; version=0.0.4')
+
+
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=True)
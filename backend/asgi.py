@@ -0,0 +1,313 @@
+"""Async serving mode for the parse API.
+
+Upstream fetches go through one pooled ``httpx.AsyncClient`` so slow recipe
+sites only hold a coroutine, not a worker thread. Run it with any ASGI
+server, e.g.::
+
+    uvicorn asgi:app --port 5000
+"""
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+import httpx
+import requests
+
+import metrics
+from cache import normalize_url
+from corpus import NotRecorded, replay_corpus
+from fetch import (ACCEPT_ENCODING, CHUNK_SIZE, CONNECT_TIMEOUT, MAX_FETCH_SECONDS, READ_TIMEOUT,
+                   USER_AGENT, BodyReader, BudgetExceeded, Page, fetch_page, too_slow)
+from pipeline import (MAX_HAVE_INGREDIENTS, MAX_SEARCH_RESULTS, cached_parse, extract_in_worker, extract_recipe,
+                      fetch_metadata, parse_cache_from_env, prewarm, recipe_store_from_env)
+
+MAX_INFLIGHT_FETCHES = int(os.environ.get('RECIPEASY_MAX_INFLIGHT_FETCHES', 64))
+PARSE_WORKERS = int(os.environ.get('RECIPEASY_PARSE_WORKERS', os.cpu_count()))
+PREWARM = os.environ.get('RECIPEASY_PREWARM') == '1'
+
+parse_cache = parse_cache_from_env()
+recipe_store = recipe_store_from_env()
+
+
+def _finish_reading(reader):
+    return reader.html(), reader.structured()
+
+
+class AsyncParser:
+    """Fetches with a shared client and parses in a process pool.
+
+    At most ``max_inflight`` downloads run at once, and concurrent requests
+    for the same normalized URL share a single download and parse.
+    """
+
+    def __init__(self, cache, max_inflight=MAX_INFLIGHT_FETCHES, parse_workers=PARSE_WORKERS, replay=None):
+        self.cache = cache
+        self.replay = replay
+        self.max_inflight = max_inflight
+        self.parse_workers = parse_workers
+        self._client = None
+        self._parse_pool = None
+        self._fetch_slots = None
+        self._inflight = {}
+
+    async def start(self):
+        self._client = httpx.AsyncClient(
+            headers={'User-Agent': USER_AGENT, 'Accept-Encoding': ACCEPT_ENCODING},
+            timeout=httpx.Timeout(min(READ_TIMEOUT, MAX_FETCH_SECONDS), connect=CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=self.max_inflight),
+            follow_redirects=True,
+        )
+        self._parse_pool = ProcessPoolExecutor(max_workers=self.parse_workers)
+        self._fetch_slots = asyncio.Semaphore(self.max_inflight)
+
+    async def stop(self):
+        await self._client.aclose()
+        self._parse_pool.shutdown(wait=False, cancel_futures=True)
+
+    async def fetch(self, url, headers=None):
+        if self.replay is not None:
+            # Gunzips the recording and runs the same decode and lxml parse as a live
+            # download, all on the one worker thread, so it must stay off the loop too
+            return await asyncio.to_thread(self.replay.fetch_page, url, headers)
+        async with self._fetch_slots:
+            started = time.monotonic()
+            try:
+                return await asyncio.wait_for(self._stream(url, headers, started), MAX_FETCH_SECONDS)
+            except asyncio.TimeoutError:
+                raise too_slow(MAX_FETCH_SECONDS)
+
+    async def _stream(self, url, headers, started):
+        async with self._client.stream('GET', url, headers=headers) as response:
+            ttfb_ms = round((time.monotonic() - started) * 1000, 1)
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            metrics.record_fetch(url, response.status_code)
+            if response.status_code == 304:
+                return Page(304, None, etag, last_modified, 0, ttfb_ms)
+            response.raise_for_status()
+
+            # Decompression and lxml's incremental parse are CPU work, so they run off the
+            # loop. lxml parsers must stay on the thread that created them, hence one
+            # thread per download rather than the shared default executor.
+            loop = asyncio.get_running_loop()
+            parse_thread = ThreadPoolExecutor(max_workers=1)
+            try:
+                reader = await loop.run_in_executor(parse_thread, BodyReader, response.headers, started)
+                try:
+                    async for raw in response.aiter_raw(CHUNK_SIZE):
+                        if await loop.run_in_executor(parse_thread, reader.feed, raw):
+                            break
+                finally:
+                    metrics.record_bytes(url, reader.bytes_read)
+                html, structured = await loop.run_in_executor(parse_thread, _finish_reading, reader)
+            finally:
+                parse_thread.shutdown(wait=False)
+            return Page(response.status_code, html, etag, last_modified,
+                        reader.bytes_read, ttfb_ms, structured)
+
+    async def parse(self, url):
+        started = time.perf_counter()
+        with metrics.collect() as timings:
+            try:
+                result, shared_timings = await self._parse(url)
+            except Exception as e:
+                metrics.record_parse(url, timings, time.perf_counter() - started, 'error', e)
+                raise
+        if shared_timings is None:
+            metrics.record_parse(url, timings, time.perf_counter() - started, result['fetch']['cache'])
+        else:
+            # Joined another request's download; that request records the stages, once
+            metrics.record_parse(url, {}, time.perf_counter() - started, 'coalesced')
+            timings = shared_timings
+        # Coalesced callers share one result dict, so copy before adding per-request timings
+        return dict(result, timings_ms={name: round(value * 1000, 2) for name, value in timings.items()})
+
+    async def _cache_call(self, method, *args):
+        # The SQLite tier opens a connection and commits; keep that off the event loop
+        if self.cache.db_path:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    async def profile(self, url):
+        """Parse ``url`` under cProfile; returns the result and the top functions.
+
+        cProfile can't follow a coroutine across awaits, and on the loop it
+        would also pick up every other request, so this runs the WSGI app's
+        synchronous pipeline in a worker thread instead.
+        """
+        fetch = self.replay.fetch_page if self.replay is not None else fetch_page
+        return await asyncio.to_thread(metrics.profile_call, lambda: cached_parse(self.cache, url, fetch))
+
+    async def _parse(self, url):
+        """The result, plus the shared stage timings if another request did the work (else None)."""
+        key = normalize_url(url)
+        entry = await self._cache_call(self.cache.get, key)
+        if entry is not None and entry.is_fresh(self.cache.ttl):
+            return dict(entry.result, fetch=fetch_metadata('hit')), None
+
+        flight = self._inflight.get(key)
+        if flight is not None:
+            return await asyncio.shield(flight)
+
+        flight = self._inflight[key] = asyncio.ensure_future(self._refresh(url, key, entry))
+        flight.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shield so one caller disconnecting doesn't cancel the download for the rest
+        result, timings = await asyncio.shield(flight)
+        metrics.add_timings(timings)
+        return result, None
+
+    async def _refresh(self, url, key, entry):
+        # The task runs in a copy of the first caller's context, so collect its own
+        # timings and let every caller decide what to do with them
+        with metrics.collect() as timings:
+            with metrics.stage('download'):
+                page = await self.fetch(url, entry.conditional_headers() if entry else None)
+            if page.status == 304 and entry is not None:
+                await self._cache_call(self.cache.revalidated, key, entry)
+                return dict(entry.result, fetch=fetch_metadata('revalidated', page)), timings
+
+            if page.structured is not None and page.structured[0] is not None:
+                result = extract_recipe(url, page.html, page.structured)
+            else:
+                loop = asyncio.get_running_loop()
+                result, worker_timings = await loop.run_in_executor(
+                    self._parse_pool, extract_in_worker, url, page.html, page.structured)
+                metrics.add_timings(worker_timings)
+            await self._cache_call(self.cache.put, key, result, page.etag, page.last_modified)
+        return dict(result, fetch=fetch_metadata('miss', page)), timings
+
+
+parser = AsyncParser(parse_cache, replay=replay_corpus())
+
+
+async def read_json(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            break
+    try:
+        return json.loads(body or b'{}')
+    except ValueError:
+        return {}
+
+
+async def send_body(send, body, content_type, status=200):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', content_type), (b'content-length', str(len(body)).encode())],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def send_json(send, payload, status=200):
+    await send_body(send, json.dumps(payload).encode('utf-8'), b'application/json', status)
+
+
+def query_params(scope):
+    return {key: values[0] for key, values in parse_qs(scope['query_string'].decode('latin-1')).items()}
+
+
+def search_limit(params):
+    try:
+        limit = int(params.get('limit', 20))
+    except ValueError:
+        limit = 20
+    return max(1, min(limit, MAX_SEARCH_RESULTS))
+
+
+async def parse_recipe(scope, receive, send):
+    data = await read_json(receive)
+    url = data.get('url')
+
+    if not url:
+        return await send_json(send, {'error': 'No URL provided'}, 400)
+
+    try:
+        if query_params(scope).get('profile') == '1':
+            result, profile = await parser.profile(url)
+            result['profile'] = profile
+        else:
+            result = await parser.parse(url)
+    except BudgetExceeded as e:
+        return await send_json(send, {'error': str(e)}, e.status)
+    except NotRecorded as e:
+        return await send_json(send, {'error': str(e)}, 404)
+    except (httpx.TimeoutException, requests.Timeout) as e:
+        return await send_json(send, {'error': 'Upstream timed out: %s' % e}, 504)
+    except Exception as e:
+        return await send_json(send, {'error': str(e)}, 500)
+    # SQLite inserts and FTS updates block; keep them off the event loop
+    await asyncio.to_thread(recipe_store.add, url, result)
+    await send_json(send, result)
+
+
+async def search_recipes(scope, receive, send):
+    params = query_params(scope)
+    query = params.get('q', '').strip()
+
+    if not query:
+        return await send_json(send, {'error': 'No query provided'}, 400)
+
+    results = await asyncio.to_thread(recipe_store.search, query, search_limit(params))
+    await send_json(send, {'results': results})
+
+
+async def recipes_by_ingredients(scope, receive, send):
+    params = query_params(scope)
+    have = [item.strip() for item in params.get('have', '').split(',') if item.strip()]
+
+    if not have:
+        return await send_json(send, {'error': 'No ingredients provided'}, 400)
+    if len(have) > MAX_HAVE_INGREDIENTS:
+        return await send_json(send, {'error': 'At most %d ingredients per query' % MAX_HAVE_INGREDIENTS}, 400)
+
+    results = await asyncio.to_thread(recipe_store.by_ingredients, have, search_limit(params))
+    await send_json(send, {'results': results})
+
+
+async def cache_stats(scope, receive, send):
+    await send_json(send, parse_cache.stats())
+
+
+async def metrics_endpoint(scope, receive, send):
+    body = metrics.render(parse_cache.stats()).encode('utf-8')
+    await send_body(send, body, b'text/plain; version=0.0.4; charset=utf-8')
+
+
+ROUTES = {
+    ('POST', '/parse'): parse_recipe,
+    ('GET', '/recipes/search'): search_recipes,
+    ('GET', '/recipes/by-ingredients'): recipes_by_ingredients,
+    ('GET', '/cache/stats'): cache_stats,
+    ('GET', '/metrics'): metrics_endpoint,
+}
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            if PREWARM:
+                # Before the parse pool exists, so forked workers inherit the warm parser
+                prewarm()
+            await parser.start()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await parser.stop()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    handler = ROUTES.get((scope['method'], scope['path']))
+    if handler is None:
+        return await send_json(send, {'error': 'Not found'}, 404)
+    await handler(scope, receive, send)
@@ -0,0 +1,63 @@
+import os
+import queue
+import threading
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import metrics
+from fetch import fetch_page
+from pipeline import cached_parse, extract_in_worker, extract_recipe
+
+
+class BatchParser:
+    """Parse many recipe URLs at once.
+
+    Downloads run on a bounded thread pool with at most ``per_host``
+    concurrent requests to any one site; the lxml/newspaper work is shipped
+    to a process pool so it spreads across cores. Results are yielded in
+    completion order, each carrying its own error if that URL failed.
+    """
+
+    def __init__(self, cache, fetch_workers=16, per_host=4, parse_workers=None, fetch=fetch_page):
+        self.cache = cache
+        self.fetch = fetch
+        self.per_host = per_host
+        self._fetch_pool = ThreadPoolExecutor(max_workers=fetch_workers)
+        self._parse_workers = parse_workers or os.cpu_count()
+        self._parse_pool = None
+        self._host_limits = defaultdict(lambda: threading.BoundedSemaphore(self.per_host))
+        self._lock = threading.Lock()
+
+    def _host_limit(self, url):
+        with self._lock:
+            return self._host_limits[urlsplit(url).netloc]
+
+    def _fetch(self, url, headers=None):
+        with self._host_limit(url):
+            return self.fetch(url, headers)
+
+    def _extract(self, url, html, structured=None):
+        # Pages whose schema.org data was found while streaming need no parse at all
+        if structured is not None and structured[0] is not None:
+            return extract_recipe(url, html, structured)
+        with self._lock:
+            if self._parse_pool is None:
+                self._parse_pool = ProcessPoolExecutor(max_workers=self._parse_workers)
+        result, timings = self._parse_pool.submit(extract_in_worker, url, html, structured).result()
+        metrics.add_timings(timings)
+        return result
+
+    def _parse_one(self, index, url, results):
+        try:
+            result = cached_parse(self.cache, url, fetch=self._fetch, extract=self._extract)
+            results.put({'index': index, 'url': url, **result})
+        except Exception as e:
+            results.put({'index': index, 'url': url, 'error': str(e)})
+
+    def run(self, urls):
+        results = queue.Queue()
+        for index, url in enumerate(urls):
+            self._fetch_pool.submit(self._parse_one, index, url, results)
+        for _ in urls:
+            yield results.get()
@@ -0,0 +1,70 @@
+"""Wall-clock time of N serial /parse calls against one /parse/batch call.
+
+Runs the Flask app and a stub recipe site with injected latency in-process:
+
+    python benchmarks/bench_batch.py --pages 100 --latency 0.3
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+import requests
+from werkzeug.serving import make_server
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Keep benchmark recipes out of the real store
+os.environ.setdefault('RECIPEASY_STORE_DB', ':memory:')
+
+from app import app  # noqa: E402
+from stub_server import start_stub_server  # noqa: E402
+
+
+def start_app():
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, 'http://127.0.0.1:%d' % server.server_port
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds added per upstream request')
+    parser.add_argument('--hosts', type=int, default=4, help='distinct upstream sites to spread pages over')
+    args = parser.parse_args()
+
+    # One stub per simulated site, so per-host limits apply as they would in production
+    sites = [start_stub_server(args.latency)[1] for _ in range(args.hosts)]
+    _, app_url = start_app()
+
+    def page_urls(run):
+        # Distinct query strings per run keep the parse cache out of the comparison
+        return ['%s/recipe/%d?run=%s' % (sites[i % len(sites)], i, run) for i in range(args.pages)]
+
+    start = time.perf_counter()
+    for url in page_urls('serial'):
+        requests.post(app_url + '/parse', json={'url': url}).raise_for_status()
+    serial = time.perf_counter() - start
+
+    start = time.perf_counter()
+    response = requests.post(app_url + '/parse/batch', json={'urls': page_urls('batch')}, stream=True)
+    results = [json.loads(line) for line in response.iter_lines() if line]
+    batch = time.perf_counter() - start
+
+    errors = sum(1 for result in results if 'error' in result)
+    print(json.dumps({
+        'pages': args.pages,
+        'upstream_latency_s': args.latency,
+        'serial_s': round(serial, 3),
+        'batch_s': round(batch, 3),
+        'speedup': round(serial / batch, 2) if batch else None,
+        'batch_errors': errors,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
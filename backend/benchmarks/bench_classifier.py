@@ -0,0 +1,142 @@
+"""Per-page cost and accuracy of splitting recipe text into ingredients and steps.
+
+Compares classifier.classify_lines with the substring/list-scan heuristic it
+replaced, over synthetic blog-style pages (or a directory of .txt pages).
+Accuracy is ingredient precision/recall, reported twice: ``tuning_accuracy``
+over the example lines below, which the classifier was tuned against and so
+is only a sanity check, and ``heldout_accuracy`` over the hand-labelled
+ingredient and step lines in the corpus's expected.json, which it wasn't:
+
+    python benchmarks/bench_classifier.py --pages 20 --lines 5000
+    python benchmarks/bench_classifier.py --corpus path/to/texts
+    python benchmarks/bench_classifier.py --labels recorded/expected.json
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classifier import classify_lines, split_lines  # noqa: E402
+
+DEFAULT_LABELS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus', 'expected.json')
+
+# Tuning examples: the classifier's patterns were fitted to these, so scores on them prove little
+INGREDIENT_LINES = [
+    '1 1/2 cups all-purpose flour', '½ tsp fine sea salt', '2 tablespoons unsalted butter, melted',
+    '3 large eggs', '250 g dark chocolate', '1 (14 oz) can diced tomatoes', '2-3 cloves garlic, minced',
+    'Salt and pepper, to taste', '¾ cup whole milk', '1 tsp vanilla extract',
+    'Juice of 2 lemons', 'Kosher salt', '2 ripe avocados, diced', '4 tomatoes',
+]
+PROSE_LINES = [
+    'This is the recipe my grandmother made every single Sunday when we were growing up.',
+    'Whisk everything together until smooth and let it rest while the pan heats up.',
+    'If you make this, leave a comment below and tag us on social media!',
+    'Bake for 25 minutes, or until a skewer inserted in the middle comes out clean.',
+    'We tested this with three different brands and the results were surprisingly similar.',
+    'Jump to Recipe', 'Print Recipe', 'Pin this for later!',
+    'My kids love chicken.', 'The best part is the butter.', '2024 was great', 'I used 2 cans of beans',
+    'Serves 4', '2. Preheat the oven to 350 degrees.', '10 minutes later the cream had set.',
+]
+
+
+def legacy_classify(lines):
+    ingredients = [line for line in lines if 'cup' in line.lower() or 'tsp' in line.lower() or 'tablespoon' in line.lower()]
+    steps = [line for line in lines if line not in ingredients][:10]
+    return ingredients, steps
+
+
+def synthetic_pages(count, lines, seed=0):
+    rng = random.Random(seed)
+    for _ in range(count):
+        # Blog pages are mostly prose and comments; the numbering keeps lines distinct as on real pages
+        yield '\n'.join(
+            '%s (%d)' % (rng.choice(INGREDIENT_LINES) if rng.random() < 0.3 else rng.choice(PROSE_LINES), n)
+            for n in range(lines))
+
+
+def load_corpus(path):
+    for name in sorted(glob.glob(os.path.join(path, '*.txt'))):
+        with open(name, encoding='utf-8') as f:
+            yield f.read()
+
+
+def load_labels(path):
+    """Ingredient and step lines from a corpus's expected.json; steps serve as the negatives."""
+    with open(path, encoding='utf-8') as f:
+        expected = json.load(f)
+    ingredients = sorted({line for page in expected.values() for line in page['ingredients']})
+    steps = sorted({line for page in expected.values() for line in page['steps']} - set(ingredients))
+    return ingredients, steps
+
+
+def accuracy(classify, ingredient_lines, other_lines):
+    ingredients, _ = classify(ingredient_lines + other_lines)
+    found = set(ingredients)
+    matched = len(found & set(ingredient_lines))
+    return {
+        'lines': len(ingredient_lines) + len(other_lines),
+        'precision': round(matched / len(found), 3) if found else 1.0,
+        'recall': round(matched / len(ingredient_lines), 3) if ingredient_lines else 1.0,
+        'missed': sorted(set(ingredient_lines) - found),
+        'false_positives': sorted(found - set(ingredient_lines)),
+    }
+
+
+def accuracy_report(classify, labels):
+    return {
+        'tuning_accuracy': accuracy(classify, INGREDIENT_LINES, PROSE_LINES),
+        'heldout_accuracy': accuracy(classify, *labels),
+    }
+
+
+def time_per_page(classify, pages, repeat):
+    timings = []
+    for text in pages:
+        best = min(_timed(classify, text) for _ in range(repeat))
+        timings.append(best * 1000)
+    return {
+        'mean_ms': round(statistics.mean(timings), 3),
+        'p50_ms': round(statistics.median(timings), 3),
+        'max_ms': round(max(timings), 3),
+    }
+
+
+def _timed(classify, text):
+    start = time.perf_counter()
+    classify(split_lines(text))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=20)
+    parser.add_argument('--lines', type=int, default=5000, help='lines per synthetic page')
+    parser.add_argument('--corpus', help='directory of .txt pages to use instead of synthetic ones')
+    parser.add_argument('--labels', default=DEFAULT_LABELS,
+                        help='expected.json with held-out labelled lines (default: benchmarks/corpus)')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--skip-legacy', action='store_true', help='legacy scan is quadratic; skip it on huge pages')
+    args = parser.parse_args()
+
+    pages = list(load_corpus(args.corpus) if args.corpus else synthetic_pages(args.pages, args.lines))
+    labels = load_labels(args.labels)
+    report = {
+        'pages': len(pages),
+        'mean_lines': round(statistics.mean(len(split_lines(text)) for text in pages)),
+        'classifier': time_per_page(classify_lines, pages, args.repeat),
+        'classifier_accuracy': accuracy_report(lambda lines: classify_lines(lines, max_steps=None), labels),
+        'legacy_accuracy': accuracy_report(legacy_classify, labels),
+    }
+    if not args.skip_legacy:
+        report['legacy'] = time_per_page(legacy_classify, pages, args.repeat)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""Cold-start cost of a backend worker: import time and time to first parse.
+
+Every run is a fresh interpreter, so nothing is shared between runs:
+
+    python benchmarks/bench_coldstart.py --runs 5
+    python benchmarks/bench_coldstart.py --importtime 15   # slowest imports of `import app`
+
+Modes: ``lazy`` is the default worker, ``prewarm`` sets RECIPEASY_PREWARM=1,
+and ``eager`` imports newspaper up front the way the app used to.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_server import start_stub_server  # noqa: E402
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child: import the app, then time two parses of pages with no structured data
+WORKER = '''
+import json, sys, time
+started = time.perf_counter()
+if sys.argv[1] == 'eager':
+    import newspaper
+from app import app
+imported = time.perf_counter()
+client = app.test_client()
+timings = []
+for path in ('/recipe/first', '/recipe/second'):
+    start = time.perf_counter()
+    response = client.post('/parse', json={'url': sys.argv[2] + path})
+    assert response.status_code == 200, response.get_json()
+    timings.append(time.perf_counter() - start)
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'first_parse_ms': timings[0] * 1000,
+    'second_parse_ms': timings[1] * 1000,
+    'ready_to_first_result_ms': (time.perf_counter() - started - timings[1]) * 1000,
+}))
+'''
+
+
+def child_env(mode):
+    env = dict(os.environ, RECIPEASY_STORE_DB=':memory:', PYTHONDONTWRITEBYTECODE='1')
+    env.pop('RECIPEASY_PREWARM', None)
+    if mode == 'prewarm':
+        env['RECIPEASY_PREWARM'] = '1'
+    return env
+
+
+def run_once(mode, stub_url):
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, '-c', WORKER, mode, stub_url], cwd=BACKEND_DIR, env=child_env(mode),
+        capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result['process_ms'] = (time.perf_counter() - start) * 1000
+    return result
+
+
+def import_profile(limit):
+    """Slowest modules under ``python -X importtime -c 'import app'``, by cumulative time."""
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=BACKEND_DIR,
+        env=child_env('lazy'), capture_output=True, text=True, check=True).stderr
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Nested imports are indented, so top-level ones add up to the total
+        modules.append((int(cumulative), name.strip(), not name.startswith('  ')))
+    return {
+        'total_ms': round(sum(us for us, _, top in modules if top) / 1000, 1),
+        'newspaper_imported': any(name == 'newspaper' for _, name, _ in modules),
+        'slowest': [{'module': name, 'cumulative_ms': round(us / 1000, 1)}
+                    for us, name, _ in sorted(modules, reverse=True)[:limit]],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=3, help='fresh processes per mode')
+    parser.add_argument('--modes', default='lazy,prewarm,eager')
+    parser.add_argument('--importtime', type=int, default=10, help='slowest imports to list')
+    args = parser.parse_args()
+
+    _, stub_url = start_stub_server()
+    report = {'runs': args.runs, 'import_profile': import_profile(args.importtime)}
+    for mode in args.modes.split(','):
+        runs = [run_once(mode, stub_url) for _ in range(args.runs)]
+        report[mode] = {name: round(statistics.median(run[name] for run in runs), 1) for name in runs[0]}
+    print(json.dumps(report, indent=2, sort_keys=True))
+
+
+if __name__ == '__main__':
+    main()
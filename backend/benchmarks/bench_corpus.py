@@ -0,0 +1,197 @@
+"""Speed and accuracy of recipe extraction over a recorded corpus.
+
+Replays every page in a corpus (see record_corpus.py) through the same
+cache/fetch/extract pipeline as /parse, with no network access, and reports
+pages/sec, per-stage latency percentiles, peak resident memory, and
+ingredient/step precision and recall against the corpus's expected.json.
+Without --corpus it uses the small synthetic corpus in benchmarks/corpus:
+
+    python benchmarks/bench_corpus.py --passes 5 --output before.json
+    python benchmarks/bench_corpus.py --corpus recorded/ --accuracy-only > accuracy.json
+
+Output is JSON with sorted keys, so two runs can be compared with diff.
+Accuracy is deterministic; timings and memory naturally vary run to run.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import ParseCache, normalize_url  # noqa: E402
+from corpus import Corpus  # noqa: E402
+from pipeline import cached_parse  # noqa: E402
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus')
+
+
+def run_pass(corpus, urls):
+    """Parse every URL once through a fresh cache; returns results and errors by URL."""
+    cache = ParseCache(max_entries=len(urls) + 1)
+    results = {}
+    errors = {}
+    for url in urls:
+        try:
+            results[url] = cached_parse(cache, url, fetch=corpus.fetch_page)
+        except Exception as e:
+            errors[url] = '%s: %s' % (type(e).__name__, e)
+    return results, errors
+
+
+def percentiles(values):
+    ordered = sorted(values)
+
+    def pct(p):
+        return round(ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))], 3)
+
+    return {'p50_ms': pct(50), 'p95_ms': pct(95), 'p99_ms': pct(99), 'max_ms': round(ordered[-1], 3),
+            'count': len(ordered)}
+
+
+def measure(corpus, urls, passes):
+    stages = defaultdict(list)
+    totals = []
+    elapsed = 0.0
+    for _ in range(passes):
+        start = time.perf_counter()
+        results, _ = run_pass(corpus, urls)
+        elapsed += time.perf_counter() - start
+        for result in results.values():
+            for name, value in result['timings_ms'].items():
+                stages[name].append(value)
+            totals.append(sum(result['timings_ms'].values()))
+
+    return dict({
+        'passes': passes,
+        'pages_per_sec': round(len(urls) * passes / elapsed, 1) if elapsed else None,
+        'stages': {name: percentiles(values) for name, values in stages.items()},
+        'total': percentiles(totals) if totals else None,
+    }, **measure_memory(corpus.path))
+
+
+def _max_rss_kb():
+    try:
+        # VmHWM starts afresh at exec, while ru_maxrss on Linux can carry over
+        # the peak of the process that spawned us
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on Linux but bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+def measure_memory(path):
+    """Peak RSS of one pass in a fresh process.
+
+    Unlike tracemalloc this includes libxml2 trees and other native
+    allocations. The baseline is the peak after imports, before any page
+    is parsed; newspaper is imported lazily during the pass and counts
+    towards it.
+    """
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--corpus', path, '--memory-probe'],
+        capture_output=True, text=True, check=True).stdout
+    return json.loads(output)
+
+
+def memory_probe(corpus):
+    baseline = _max_rss_kb()
+    run_pass(corpus, corpus.urls())
+    print(json.dumps({'baseline_rss_kb': baseline, 'peak_rss_kb': _max_rss_kb()}))
+
+
+def normalize_line(line):
+    return ' '.join(line.lower().split())
+
+
+def _ratio(numerator, denominator):
+    # Nothing predicted (or nothing expected) counts as perfect on that side
+    return round(numerator / denominator, 4) if denominator else 1.0
+
+
+def compare(predicted, expected):
+    """Multiset match of normalized lines: counts plus the lines that differ."""
+    predicted = Counter(normalize_line(line) for line in predicted)
+    expected = Counter(normalize_line(line) for line in expected)
+    matched = sum((predicted & expected).values())
+    return {
+        'matched': matched,
+        'predicted': sum(predicted.values()),
+        'expected': sum(expected.values()),
+        'missed': sorted((expected - predicted).elements()),
+        'extra': sorted((predicted - expected).elements()),
+    }
+
+
+def score(matches):
+    matched = sum(match['matched'] for match in matches)
+    precision = _ratio(matched, sum(match['predicted'] for match in matches))
+    recall = _ratio(matched, sum(match['expected'] for match in matches))
+    f1 = round(2 * precision * recall / (precision + recall), 4) if precision + recall else 0.0
+    return {'precision': precision, 'recall': recall, 'f1': f1}
+
+
+def accuracy(corpus, results):
+    pages = {}
+    totals = {'ingredients': [], 'steps': []}
+    extractors = Counter(result.get('extractor') for result in results.values())
+    for url, result in results.items():
+        expected = corpus.expected.get(normalize_url(url))
+        if expected is None:
+            continue
+        page = {'extractor': result.get('extractor')}
+        for field in ('ingredients', 'steps'):
+            match = compare(result.get(field) or [], expected[field])
+            totals[field].append(match)
+            page[field] = dict(match, **score([match]))
+        pages[url] = page
+    return {
+        'labelled': len(pages),
+        'extractors': dict(extractors),
+        'ingredients': score(totals['ingredients']),
+        'steps': score(totals['steps']),
+        'pages': pages,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--corpus', default=os.environ.get('RECIPEASY_REPLAY_CORPUS', DEFAULT_CORPUS),
+                        help='corpus directory (default: $RECIPEASY_REPLAY_CORPUS, else benchmarks/corpus)')
+    parser.add_argument('--passes', type=int, default=3, help='timed passes over the corpus')
+    parser.add_argument('--accuracy-only', action='store_true', help='skip timing and memory')
+    parser.add_argument('--output', help='write the report here instead of stdout')
+    parser.add_argument('--memory-probe', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    corpus = Corpus(args.corpus)
+    urls = corpus.urls()
+    if not urls:
+        parser.error('no pages recorded in %s' % args.corpus)
+    if args.memory_probe:
+        return memory_probe(corpus)
+
+    results, errors = run_pass(corpus, urls)
+    report = {'pages': len(urls), 'errors': errors, 'accuracy': accuracy(corpus, results)}
+    if not args.accuracy_only:
+        report['performance'] = measure(corpus, urls, args.passes)
+
+    output = json.dumps(report, indent=2, sort_keys=True, ensure_ascii=False) + '\n'
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        sys.stdout.write(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Query latency of the recipe store on synthetic data.
+
+Fills an in-memory (or on-disk) store with synthetic recipes whose
+ingredients follow a Zipf-like popularity curve, then times
+/recipes/by-ingredients and /recipes/search style lookups:
+
+    python benchmarks/bench_store.py --recipes 1000000
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from store import RecipeStore  # noqa: E402
+
+VOCABULARY_SIZE = 2000
+DISHES = ('cake', 'soup', 'stew', 'salad', 'pie', 'curry', 'bread', 'pasta', 'tart', 'roast')
+
+
+def ingredient_names(rng):
+    # Made-up but pronounceable names so the ingredient tokenizer treats each as one word
+    syllables = ('ba', 'ko', 'ri', 'mu', 'te', 'lo', 'sa', 'ni', 'fe', 'du', 'ga', 'pi')
+    names = set()
+    while len(names) < VOCABULARY_SIZE:
+        names.add(''.join(rng.choice(syllables) for _ in range(rng.randint(2, 4))) + 'n')
+    return sorted(names)
+
+
+def synthetic_recipes(count, seed=0):
+    rng = random.Random(seed)
+    names = ingredient_names(rng)
+    weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(names))))
+    for n in range(count):
+        ingredients = set(rng.choices(names, cum_weights=weights, k=rng.randint(4, 14)))
+        title = '%s %s' % (rng.choice(names).title(), rng.choice(DISHES))
+        yield 'https://example.com/recipes/%d' % n, {
+            'title': title,
+            'ingredients': ['%d cups %s' % (rng.randint(1, 4), name) for name in sorted(ingredients)],
+            'steps': ['Combine the %s and cook until done.' % name for name in sorted(ingredients)[:3]],
+        }, names, weights
+
+
+def time_queries(run, queries):
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        run(query)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        'p50_ms': round(statistics.median(timings), 3),
+        'p99_ms': round(timings[int(len(timings) * 0.99) - 1], 3),
+        'max_ms': round(timings[-1], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--recipes', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--db', default=':memory:')
+    args = parser.parse_args()
+
+    store = RecipeStore(args.db)
+    start = time.perf_counter()
+    batch = []
+    for url, recipe, names, weights in synthetic_recipes(args.recipes):
+        batch.append((url, recipe))
+        if len(batch) == 5000:
+            store.add_many(batch)
+            batch = []
+    store.add_many(batch)
+    load_s = time.perf_counter() - start
+
+    rng = random.Random(1)
+    ingredient_queries = [rng.choices(names, cum_weights=weights, k=rng.randint(1, 3)) for _ in range(args.queries)]
+    text_queries = ['%s %s' % (rng.choice(names[:200]), rng.choice(DISHES)) for _ in range(args.queries)]
+    print(json.dumps({
+        'recipes': args.recipes,
+        'load_s': round(load_s, 1),
+        'by_ingredients': time_queries(store.by_ingredients, ingredient_queries),
+        'search': time_queries(store.search, text_queries),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
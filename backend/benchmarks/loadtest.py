@@ -0,0 +1,140 @@
+"""Throughput and tail latency of the WSGI and ASGI serving modes.
+
+Both servers run in-process against a local stub recipe site with injected
+latency. The WSGI server gets a fixed pool of worker threads, like a
+threaded gunicorn worker, so slow upstreams can starve it:
+
+    python benchmarks/loadtest.py --requests 400 --concurrency 100 --latency 0.5
+    python benchmarks/loadtest.py --mode asgi --same-url   # exercise request coalescing
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import uvicorn
+from werkzeug.serving import BaseWSGIServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Keep benchmark recipes out of the real store
+os.environ.setdefault('RECIPEASY_STORE_DB', ':memory:')
+
+from stub_server import start_stub_server  # noqa: E402
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Werkzeug server that handles requests on a fixed-size thread pool."""
+
+    def __init__(self, host, port, app, threads):
+        super().__init__(host, port, app)
+        self._pool = ThreadPoolExecutor(max_workers=threads)
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def start_wsgi(threads):
+    from app import app
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = PooledWSGIServer('127.0.0.1', 0, app, threads)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return 'http://127.0.0.1:%d' % server.server_port
+
+
+def start_asgi():
+    from asgi import app
+
+    config = uvicorn.Config(app, host='127.0.0.1', port=0, log_level='warning', lifespan='on')
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return 'http://127.0.0.1:%d' % port
+
+
+async def drive(base_url, urls, concurrency):
+    slots = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    latencies = []
+    errors = 0
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        async def one(url):
+            nonlocal errors
+            async with slots:
+                start = time.perf_counter()
+                try:
+                    response = await client.post('/parse', json={'url': url})
+                    if response.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(url) for url in urls))
+        elapsed = time.perf_counter() - start
+    return elapsed, latencies, errors
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run_mode(mode, base_url, args, stub_url):
+    if args.same_url:
+        urls = ['%s/recipe/shared?mode=%s' % (stub_url, mode)] * args.requests
+    else:
+        # Distinct URLs per mode and request keep the parse cache out of the measurement
+        urls = ['%s/recipe/%d?mode=%s' % (stub_url, i, mode) for i in range(args.requests)]
+    elapsed, latencies, errors = asyncio.run(drive(base_url, urls, args.concurrency))
+    return {
+        'requests': len(urls),
+        'errors': errors,
+        'throughput_rps': round(len(urls) / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+        'max_ms': round(max(latencies) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mode', choices=('wsgi', 'asgi', 'both'), default='both')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.5, help='seconds added per upstream request')
+    parser.add_argument('--wsgi-threads', type=int, default=8, help='worker threads for the WSGI server')
+    parser.add_argument('--same-url', action='store_true', help='every request asks for the same page')
+    args = parser.parse_args()
+
+    _, stub_url = start_stub_server(args.latency)
+    report = {'latency_s': args.latency, 'concurrency': args.concurrency}
+    if args.mode in ('wsgi', 'both'):
+        report['wsgi'] = run_mode('wsgi', start_wsgi(args.wsgi_threads), args, stub_url)
+    if args.mode in ('asgi', 'both'):
+        report['asgi'] = run_mode('asgi', start_asgi(), args, stub_url)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Record recipe pages into a replay corpus.
+
+Reads one URL per line (blank lines and ``#`` comments are skipped):
+
+    python benchmarks/record_corpus.py urls.txt --corpus corpus/
+    python benchmarks/record_corpus.py urls.txt --corpus corpus/ --label
+
+``--label`` writes the current parser's output into ``expected.json`` for
+pages that have no expectations yet. Check and correct those by hand before
+relying on them; they are a starting point, not ground truth.
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import normalize_url  # noqa: E402
+from corpus import Corpus  # noqa: E402
+from pipeline import extract_recipe  # noqa: E402
+
+
+def read_urls(path):
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('urls', help='file with one URL per line')
+    parser.add_argument('--corpus', required=True, help='corpus directory (created if missing)')
+    parser.add_argument('--label', action='store_true', help='draft expectations for unlabelled pages')
+    parser.add_argument('--refresh', action='store_true', help='re-download pages already recorded')
+    args = parser.parse_args()
+
+    corpus = Corpus(args.corpus)
+    report = {'recorded': 0, 'skipped': 0, 'labelled': 0, 'errors': {}}
+    for url in read_urls(args.urls):
+        key = normalize_url(url)
+        try:
+            if key in corpus.index and not args.refresh:
+                report['skipped'] += 1
+            else:
+                corpus.record(url)
+                report['recorded'] += 1
+            if args.label and key not in corpus.expected:
+                page = corpus.fetch_page(url)
+                recipe = extract_recipe(url, page.html, page.structured)
+                corpus.label(url, recipe['ingredients'], recipe['steps'])
+                report['labelled'] += 1
+        except Exception as e:
+            report['errors'][url] = '%s: %s' % (type(e).__name__, e)
+    corpus.save()
+    report['pages'] = len(corpus)
+    print(json.dumps(report, indent=2, sort_keys=True))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""Local stand-in for recipe sites, with injectable latency.
+
+Every path returns the same small recipe page after sleeping ``latency``
+seconds, so benchmarks measure our serving overhead without touching the
+network.
+"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RECIPE_HTML = '''<!DOCTYPE html>
+<html><head><title>Simple Pancakes</title></head>
+<body><article>
+<h1>Simple Pancakes</h1>
+<p>These fluffy pancakes are an easy weekend breakfast that the whole family will love.</p>
+<p>1 1/2 cups all-purpose flour</p>
+<p>1 tablespoon sugar</p>
+<p>2 tsp baking powder</p>
+<p>1 1/4 cups milk</p>
+<p>Whisk the flour, sugar and baking powder together in a large bowl until combined.</p>
+<p>Pour in the milk and stir until just combined; a few lumps are fine.</p>
+<p>Cook ladlefuls on a hot greased pan until bubbles form, then flip and cook until golden.</p>
+</article></body></html>
+'''
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    body = RECIPE_HTML.encode('utf-8')
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(latency=0.0, host='127.0.0.1', port=0):
+    """Start the stub in a daemon thread and return ``(server, base_url)``."""
+    handler = type('Handler', (StubHandler,), {'latency': latency})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, 'http://%s:%d' % server.server_address
@@ -0,0 +1,169 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Query parameters that never change the page content
+TRACKING_PARAMS = {'fbclid', 'gclid', 'mc_cid', 'mc_eid', 'ref', 'igshid'}
+DEFAULT_PORTS = {'http': '80', 'https': '443'}
+
+
+def normalize_url(url):
+    """Canonical form of a recipe URL, used as the cache key."""
+    parts = urlsplit(url.strip())
+    scheme = (parts.scheme or 'http').lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and str(parts.port) != DEFAULT_PORTS.get(scheme):
+        host = '%s:%s' % (host, parts.port)
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith('utm_')
+    )
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((scheme, host, path, urlencode(query), ''))
+
+
+class CacheEntry:
+    __slots__ = ('result', 'etag', 'last_modified', 'stored_at')
+
+    def __init__(self, result, etag=None, last_modified=None, stored_at=None):
+        self.result = result
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = time.time() if stored_at is None else stored_at
+
+    def is_fresh(self, ttl):
+        return time.time() - self.stored_at < ttl
+
+    def conditional_headers(self):
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class ParseCache:
+    """Parse results keyed by normalized URL.
+
+    Entries live in an in-process LRU and, when ``db_path`` is set, in a
+    SQLite table that survives restarts. Entries older than ``ttl`` are still
+    returned so the caller can revalidate them with a conditional GET. The
+    table keeps at most ``db_max_entries`` rows, dropping the oldest first.
+    """
+
+    def __init__(self, max_entries=1024, ttl=3600, db_path=None, db_max_entries=100000):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.db_path = db_path
+        self.db_max_entries = db_max_entries
+        self._db_size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(
+            ('hits', 'stale', 'misses', 'evictions', 'revalidated', 'disk_hits'), 0)
+        if db_path:
+            with self._connect() as conn:
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS parse_cache ('
+                    ' key TEXT PRIMARY KEY, result TEXT NOT NULL,'
+                    ' etag TEXT, last_modified TEXT, stored_at REAL NOT NULL)')
+                conn.execute('CREATE INDEX IF NOT EXISTS parse_cache_stored_at ON parse_cache (stored_at)')
+                self._db_size = conn.execute('SELECT COUNT(*) FROM parse_cache').fetchone()[0]
+                # The cap may have been lowered since the table was filled
+                self._trim(conn)
+
+    def _connect(self):
+        # One short-lived connection per call keeps this safe across threads
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def _count(self, name):
+        self._counters[name] += 1
+
+    def get(self, key):
+        """Return the entry for ``key`` (fresh or stale) or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None and self.db_path:
+            entry = self._load(key)
+            if entry is not None:
+                with self._lock:
+                    self._count('disk_hits')
+                    self._remember(key, entry)
+        with self._lock:
+            if entry is None:
+                self._count('misses')
+            elif entry.is_fresh(self.ttl):
+                self._count('hits')
+            else:
+                self._count('stale')
+        return entry
+
+    def put(self, key, result, etag=None, last_modified=None):
+        entry = CacheEntry(result, etag, last_modified)
+        with self._lock:
+            self._remember(key, entry)
+        if self.db_path:
+            self._store(key, entry)
+        return entry
+
+    def revalidated(self, key, entry):
+        """Mark a stale entry as fresh again after a 304 from the origin."""
+        entry.stored_at = time.time()
+        with self._lock:
+            self._count('revalidated')
+            self._remember(key, entry)
+        if self.db_path:
+            self._store(key, entry)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['size'] = len(self._entries)
+        return stats
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._count('evictions')
+
+    def _load(self, key):
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT result, etag, last_modified, stored_at FROM parse_cache WHERE key = ?',
+                (key,)).fetchone()
+        if row is None:
+            return None
+        return CacheEntry(json.loads(row[0]), row[1], row[2], row[3])
+
+    def _store(self, key, entry):
+        with self._connect() as conn:
+            exists = conn.execute('SELECT 1 FROM parse_cache WHERE key = ?', (key,)).fetchone()
+            conn.execute(
+                'INSERT OR REPLACE INTO parse_cache VALUES (?, ?, ?, ?, ?)',
+                (key, json.dumps(entry.result), entry.etag, entry.last_modified, entry.stored_at))
+            if exists is None:
+                with self._lock:
+                    self._db_size += 1
+                self._trim(conn)
+
+    def _trim(self, conn):
+        # The row count is tracked per process; other processes sharing the
+        # file can push it past the cap until their own next write trims it
+        with self._lock:
+            excess = self._db_size - self.db_max_entries
+        if excess <= 0:
+            return
+        removed = conn.execute(
+            'DELETE FROM parse_cache WHERE key IN'
+            ' (SELECT key FROM parse_cache ORDER BY stored_at LIMIT ?)', (excess,)).rowcount
+        with self._lock:
+            self._db_size -= removed
+            self._counters['evictions'] += removed
@@ -0,0 +1,161 @@
+import re
+
+VULGAR_FRACTIONS = '½⅓⅔¼¾⅕⅖⅗⅘⅙⅚⅐⅛⅜⅝⅞⅑⅒'
+
+UNITS = (
+    'cup', 'cups', 'c', 'tablespoon', 'tablespoons', 'tbsp', 'tbsps', 'tbs', 'tbl',
+    'teaspoon', 'teaspoons', 'tsp', 'tsps', 'ounce', 'ounces', 'oz', 'fl oz', 'pound', 'pounds',
+    'lb', 'lbs', 'gram', 'grams', 'g', 'kilogram', 'kilograms', 'kg', 'kgs', 'milligram',
+    'milligrams', 'mg', 'milliliter', 'milliliters', 'millilitre', 'millilitres', 'ml', 'liter',
+    'liters', 'litre', 'litres', 'l', 'dl', 'cl', 'pint', 'pints', 'pt', 'pts', 'quart', 'quarts',
+    'qt', 'qts', 'gallon', 'gallons', 'gal', 'gals', 'stick', 'sticks', 'clove', 'cloves', 'can',
+    'cans', 'jar', 'jars', 'package', 'packages', 'pkg', 'pkgs', 'packet', 'packets', 'envelope',
+    'envelopes', 'bunch', 'bunches', 'head', 'heads', 'sprig', 'sprigs', 'stalk', 'stalks',
+    'slice', 'slices', 'piece', 'pieces', 'pinch', 'pinches', 'dash', 'dashes', 'handful',
+    'handfuls', 'drop', 'drops', 'large', 'medium', 'small', 'whole',
+)
+
+INGREDIENT_WORDS = (
+    'flour', 'sugar', 'salt', 'pepper', 'butter', 'egg', 'eggs', 'milk', 'cream', 'buttermilk',
+    'yogurt', 'yoghurt', 'cheese', 'parmesan', 'mozzarella', 'oil', 'vinegar', 'garlic', 'onion',
+    'onions', 'shallot', 'shallots', 'scallion', 'scallions', 'tomato', 'tomatoes', 'potato',
+    'potatoes', 'carrot', 'carrots', 'celery', 'lemon', 'lemons', 'lime', 'limes',
+    'baking powder', 'baking soda', 'yeast', 'vanilla', 'cinnamon', 'nutmeg', 'cumin', 'paprika',
+    'oregano', 'basil', 'thyme', 'rosemary', 'parsley', 'cilantro', 'ginger', 'honey', 'syrup',
+    'water', 'stock', 'broth', 'rice', 'pasta', 'noodles', 'chicken', 'beef', 'pork', 'bacon',
+    'sausage', 'shrimp', 'salmon', 'tofu', 'beans', 'chocolate', 'cocoa', 'nuts', 'almonds',
+    'walnuts', 'pecans', 'raisins', 'soy sauce', 'apple', 'apples', 'avocado', 'avocados',
+    'banana', 'bananas', 'mushrooms', 'spinach', 'zucchini', 'peas', 'corn', 'oats', 'lentils',
+)
+
+# Imperative openings that mark a line as a method step even if it mentions units
+STEP_VERBS = (
+    'add', 'arrange', 'bake', 'beat', 'blend', 'boil', 'bring', 'combine', 'cook',
+    'cover', 'cut', 'drain', 'fold', 'fry', 'grill', 'heat', 'knead', 'let', 'line',
+    'melt', 'mix', 'place', 'pour', 'preheat', 'reduce', 'remove', 'roast', 'roll',
+    'season', 'serve', 'set', 'simmer', 'sprinkle', 'spread', 'stir', 'strain',
+    'top', 'transfer', 'toss', 'whisk',
+)
+
+# Openings that mark a line as blog prose ("My kids love chicken") rather than a list item
+PROSE_OPENERS = (
+    'i', 'if', 'it', 'its', "it's", 'my', 'our', 'she', 'he', 'so', 'the', 'then', 'these',
+    'they', 'this', 'we', 'when', 'you', 'your',
+)
+
+# Words in an ingredient line that describe preparation rather than what the ingredient is
+DESCRIPTORS = frozenset((
+    'a', 'about', 'all', 'an', 'and', 'beaten', 'chopped', 'cold', 'cut', 'diced', 'divided', 'extra',
+    'finely', 'for', 'fresh', 'freshly', 'grated', 'ground', 'into', 'melted', 'minced', 'more',
+    'of', 'optional', 'or', 'packed', 'peeled', 'plus', 'purpose', 'room', 'salted', 'sliced',
+    'softened', 'taste', 'temperature', 'the', 'to', 'unsalted', 'virgin', 'warm', 'with',
+))
+
+# Ingredient lines are short; this also keeps the unanchored alternatives cheap
+MAX_INGREDIENT_LENGTH = 120
+# Without a leading quantity, only list-shaped lines this short can be ingredients
+MAX_UNQUANTIFIED_LENGTH = 60
+
+
+def _trie_pattern(words):
+    """Regex alternation for ``words`` shaped as a prefix trie.
+
+    Python's ``re`` tries alternatives one by one, so sharing prefixes keeps
+    each position to a single branch per character instead of one per word.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        end = '' in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        if len(branches) == 1 and not end:
+            return branches[0]
+        body = '(?:%s)' % '|'.join(branches)
+        return body + '?' if end else body
+
+    return build(trie)
+
+
+_QUANTITY = r'(?:\d+\s+\d+/\d+|\d+/\d+|\d+(?:[.,]\d+)?\s*[{f}]?|[{f}])'.format(f=VULGAR_FRACTIONS)
+_RANGE = r'{q}(?:\s*(?:-|–|to)\s*{q})?'.format(q=_QUANTITY)
+_UNIT = _trie_pattern(UNITS) + r'\.?'
+_LEAD = r'[\s\-*•▢◦·]*'
+
+INGREDIENT_PATTERN = re.compile(
+    r'^(?=.{{1,{max}}}$)'
+    r'(?!{lead}(?:{verbs})\b)'
+    r'{lead}(?:'
+    # A quantity that is not a step number ("2." or "3)") or a time/temperature,
+    # followed by a unit ("2 (14 oz) cans") or naming an ingredient ("3 ripe tomatoes")
+    r'{range}(?![\d/])(?![.)]\s)(?!\s*(?:min|minutes?|hours?|hrs?|seconds?|secs?|degrees?|°)\b)'
+    r'(?:\s*(?:\([^)]*\)\s*)?{unit}(?!\w)|.*?\b(?:{words})\b)'
+    # ...or a short line that doesn't read like a sentence and mentions a
+    # quantity with a unit or a common ingredient ("Salt and pepper, to taste")
+    r'|(?=.{{1,{short}}}$)(?!(?:{openers})\b)(?!.*[.!?]\s*$)'
+    r'.*?(?:(?<![\w/]){range}\s*{unit}(?!\w)|\b(?:{words})\b)'
+    r')'.format(
+        max=MAX_INGREDIENT_LENGTH,
+        short=MAX_UNQUANTIFIED_LENGTH,
+        lead=_LEAD,
+        verbs=_trie_pattern(STEP_VERBS),
+        openers=_trie_pattern(PROSE_OPENERS),
+        range=_RANGE,
+        unit=_UNIT,
+        words=_trie_pattern(INGREDIENT_WORDS),
+    )
+)
+
+
+_WORD_PATTERN = re.compile(r'[a-z]+')
+_UNIT_WORDS = frozenset(UNITS)
+
+
+def _singular(word):
+    if word.endswith('oes'):
+        return word[:-2]
+    if word.endswith('ies') and len(word) > 4:
+        return word[:-3] + 'y'
+    if word.endswith('s') and not word.endswith(('ss', 'us')) and len(word) > 3:
+        return word[:-1]
+    return word
+
+
+def ingredient_tokens(line):
+    """Normalised ingredient words in a line, e.g. '3 large Eggs, beaten' -> ['egg']."""
+    return [
+        _singular(word) for word in _WORD_PATTERN.findall(line.lower())
+        if len(word) > 1 and word not in _UNIT_WORDS and word not in DESCRIPTORS
+    ]
+
+
+def split_lines(text):
+    return [line for line in (raw.strip() for raw in text.splitlines()) if line]
+
+
+def is_ingredient(line):
+    return INGREDIENT_PATTERN.match(line.lower()) is not None
+
+
+def classify_lines(lines, max_steps=10):
+    """Split recipe text lines into ``(ingredients, steps)`` in one pass.
+
+    Each line is lowercased once and matched against a single precompiled
+    pattern; everything that is not an ingredient is a step, up to
+    ``max_steps`` of them.
+    """
+    match = INGREDIENT_PATTERN.match
+    ingredients = []
+    steps = []
+    for line in lines:
+        if match(line.lower()) is not None:
+            ingredients.append(line)
+        elif max_steps is None or len(steps) < max_steps:
+            steps.append(line)
+    return ingredients, steps
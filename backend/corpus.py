@@ -0,0 +1,146 @@
+"""Recorded recipe pages for offline replay and regression benchmarks.
+
+A corpus is a directory holding::
+
+    index.json           normalized URL -> status, headers and body digest
+    objects/ab/<sha256>  gzipped page bodies, stored once per distinct body
+    expected.json        optional hand-checked ingredients/steps per URL
+
+Set RECIPEASY_REPLAY_CORPUS to a corpus directory to serve ``/parse`` from
+it with no network access.
+"""
+import gzip
+import hashlib
+import json
+import os
+import time
+
+import requests
+
+import metrics
+from cache import normalize_url
+from fetch import (CHUNK_SIZE, CONNECT_TIMEOUT, MAX_FETCH_SECONDS, MAX_PAGE_BYTES, READ_TIMEOUT,
+                   USER_AGENT, BodyReader, BudgetExceeded, Page)
+
+# Bodies are stored decoded, so Content-Encoding and friends are not replayed
+RECORDED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+
+class NotRecorded(LookupError):
+    """Replay was asked for a URL that isn't in the corpus."""
+
+
+def _write_json(path, data):
+    # Sorted and indented so corpus changes read well in a diff
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, sort_keys=True, ensure_ascii=False)
+        f.write('\n')
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+class Corpus:
+    """A directory of recorded pages, addressed by the SHA-256 of their body."""
+
+    def __init__(self, path):
+        self.path = path
+        self.index = _read_json(os.path.join(path, 'index.json'))
+        self.expected = _read_json(os.path.join(path, 'expected.json'))
+
+    def __len__(self):
+        return len(self.index)
+
+    def urls(self):
+        return sorted(entry['url'] for entry in self.index.values())
+
+    def _object_path(self, digest):
+        return os.path.join(self.path, 'objects', digest[:2], digest)
+
+    def add(self, url, status, headers, body):
+        """Store ``body`` (bytes, already decoded) as the recording for ``url``."""
+        digest = hashlib.sha256(body).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + '.tmp', 'wb') as f:
+                # mtime=0 keeps the same body byte-identical across recordings
+                f.write(gzip.compress(body, mtime=0))
+            os.replace(path + '.tmp', path)
+        self.index[normalize_url(url)] = {
+            'url': url,
+            'status': status,
+            'headers': {name: headers[name] for name in RECORDED_HEADERS if headers.get(name)},
+            'sha256': digest,
+            'bytes': len(body),
+        }
+        return digest
+
+    def record(self, url, max_bytes=MAX_PAGE_BYTES):
+        """Download ``url`` in full and add it to the corpus."""
+        headers = {'User-Agent': USER_AGENT}
+        with requests.get(url, headers=headers, stream=True,
+                          timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)) as response:
+            response.raise_for_status()
+            parts = []
+            size = 0
+            for chunk in response.iter_content(CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise BudgetExceeded('Page is larger than %d bytes' % max_bytes, 413)
+                parts.append(chunk)
+            return self.add(url, response.status_code, response.headers, b''.join(parts))
+
+    def label(self, url, ingredients, steps):
+        self.expected[normalize_url(url)] = {'url': url, 'ingredients': ingredients, 'steps': steps}
+
+    def save(self):
+        os.makedirs(self.path, exist_ok=True)
+        _write_json(os.path.join(self.path, 'index.json'), self.index)
+        if self.expected:
+            _write_json(os.path.join(self.path, 'expected.json'), self.expected)
+
+    def body(self, url):
+        entry = self.index.get(normalize_url(url))
+        if entry is None:
+            raise NotRecorded('Not in the replay corpus: %s' % url)
+        with open(self._object_path(entry['sha256']), 'rb') as f:
+            return entry, gzip.decompress(f.read())
+
+    def fetch_page(self, url, headers=None, max_bytes=MAX_PAGE_BYTES, max_seconds=MAX_FETCH_SECONDS):
+        """Drop-in for ``fetch.fetch_page`` that serves the recording instead.
+
+        The body goes through the same BodyReader as a live download, so
+        budgets, charset handling and early structured-data extraction all
+        behave as they would online.
+        """
+        started = time.monotonic()
+        entry, body = self.body(url)
+        recorded = entry['headers']
+        etag = recorded.get('ETag')
+        last_modified = recorded.get('Last-Modified')
+        metrics.record_fetch(url, entry['status'])
+        if etag and (headers or {}).get('If-None-Match') == etag:
+            return Page(304, None, etag, last_modified, 0, 0.0)
+
+        reader = BodyReader(recorded, started, max_bytes, max_seconds)
+        try:
+            for offset in range(0, len(body), CHUNK_SIZE):
+                if reader.feed(body[offset:offset + CHUNK_SIZE]):
+                    break
+        finally:
+            metrics.record_bytes(url, reader.bytes_read)
+        return Page(entry['status'], reader.html(), etag, last_modified,
+                    reader.bytes_read, 0.0, reader.structured())
+
+
+def replay_corpus():
+    """The corpus named by RECIPEASY_REPLAY_CORPUS, or None when serving live."""
+    path = os.environ.get('RECIPEASY_REPLAY_CORPUS')
+    return Corpus(path) if path else None
@@ -0,0 +1,279 @@
+import codecs
+import os
+import re
+import time
+import zlib
+from collections import namedtuple
+
+import requests
+from urllib3.exceptions import ReadTimeoutError
+
+import metrics
+from structured import StructuredDataExtractor
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; without it we just don't ask for br
+    brotli = None
+
+USER_AGENT = 'Mozilla/5.0 (compatible; Recipeasy/1.0)'
+CONNECT_TIMEOUT = float(os.environ.get('RECIPEASY_CONNECT_TIMEOUT', 5))
+READ_TIMEOUT = float(os.environ.get('RECIPEASY_READ_TIMEOUT', 10))
+MAX_PAGE_BYTES = int(os.environ.get('RECIPEASY_MAX_PAGE_BYTES', 5 * 1024 * 1024))
+MAX_FETCH_SECONDS = float(os.environ.get('RECIPEASY_MAX_FETCH_SECONDS', 15))
+CHUNK_SIZE = 16 * 1024
+# Without a charset in Content-Type, this much of the body is searched for a <meta> one
+CHARSET_SNIFF_BYTES = 4096
+ACCEPT_ENCODING = 'gzip, deflate, br' if brotli else 'gzip, deflate'
+
+Page = namedtuple(
+    'Page', ['status', 'html', 'etag', 'last_modified', 'bytes_read', 'ttfb_ms', 'structured'],
+    defaults=(0, None, None))
+
+
+class BudgetExceeded(Exception):
+    """A download went over its size (413) or time (504) budget."""
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+def too_slow(max_seconds):
+    return BudgetExceeded('Page took longer than %gs to download' % max_seconds, 504)
+
+
+def _inflater(wbits, raw_fallback=False):
+    decompressor = zlib.decompressobj(wbits)
+    # Input seen before the first output, kept so it can be replayed as raw deflate
+    head = bytearray() if raw_fallback else None
+
+    def inflate(data):
+        nonlocal decompressor, head
+        if head is not None:
+            head += data
+            try:
+                output = decompressor.decompress(data, CHUNK_SIZE)
+            except zlib.error:
+                # Servers disagree about deflate; some send it without the zlib wrapper
+                decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+                data, head = bytes(head), None
+            else:
+                if output:
+                    head = None
+                yield output
+                data = decompressor.unconsumed_tail
+        # Bounded output per step, so a small compressed chunk can't expand all at once
+        while data:
+            yield decompressor.decompress(data, CHUNK_SIZE)
+            data = decompressor.unconsumed_tail
+
+    return inflate
+
+
+def _unbrotli():
+    decompressor = brotli.Decompressor()
+    if not hasattr(decompressor, 'can_accept_more_data'):
+        # Before Brotli 1.2 (and in brotlicffi) process() has no output limit, so this
+        # path is not bounded per step: a whole chunk expands before the size check
+        return lambda data: (decompressor.process(data),)
+
+    def unbrotli(data):
+        # Bounded output per step, like _inflater; empty input drains what is left
+        while True:
+            output = decompressor.process(data, output_buffer_limit=CHUNK_SIZE)
+            data = b''
+            if not output and decompressor.can_accept_more_data():
+                return
+            yield output
+
+    return unbrotli
+
+
+def _decoder(content_encoding):
+    """Return a function mapping each raw chunk to an iterable of decoded pieces."""
+    encoding = (content_encoding or 'identity').strip().lower()
+    if encoding in ('', 'identity'):
+        return lambda data: (data,)
+    if encoding in ('gzip', 'x-gzip'):
+        return _inflater(16 + zlib.MAX_WBITS)
+    if encoding == 'deflate':
+        # Auto-detects a zlib or gzip header, falling back to raw deflate without one
+        return _inflater(32 + zlib.MAX_WBITS, raw_fallback=True)
+    if encoding == 'br' and brotli is not None:
+        return _unbrotli()
+    raise ValueError('Unsupported Content-Encoding: %s' % content_encoding)
+
+
+_META_CHARSET = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([\w.:-]+)', re.IGNORECASE)
+_BOMS = ((codecs.BOM_UTF8, 'utf-8-sig'), (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16'))
+
+
+def _codec(label):
+    try:
+        name = codecs.lookup(label.strip().strip('"\'')).name
+    except LookupError:
+        return None
+    # Browsers (and so page authors) treat latin-1 and ascii labels as windows-1252
+    return 'cp1252' if name in ('iso8859-1', 'latin-1', 'ascii') else name
+
+
+def _charset(content_type):
+    """Charset from a Content-Type header, or None if it doesn't name a known one."""
+    for param in (content_type or '').split(';')[1:]:
+        key, _, value = param.partition('=')
+        if key.strip().lower() == 'charset':
+            return _codec(value)
+    return None
+
+
+def _sniff_charset(head):
+    """Charset from a byte order mark or <meta> tag at the start of the body, else utf-8."""
+    for bom, name in _BOMS:
+        if head.startswith(bom):
+            return name
+    match = _META_CHARSET.search(head)
+    if match is not None:
+        # A page can't be utf-16 if its <meta> was readable as ASCII
+        name = _codec(match.group(1).decode('ascii'))
+        if name is not None and not name.startswith('utf-16'):
+            return name
+    return 'utf-8'
+
+
+class BodyReader:
+    """Decode a response body chunk by chunk within size and time budgets.
+
+    Decoded HTML is fed straight into a StructuredDataExtractor, and
+    ``feed`` returns True once there is nothing left worth reading: a
+    schema.org recipe has been found or the page's ``</body>`` has arrived.
+    ``structured()`` then says whether the page had one, so callers never
+    need to parse it for schema.org data again.
+    """
+
+    def __init__(self, headers, started, max_bytes=MAX_PAGE_BYTES, max_seconds=MAX_FETCH_SECONDS):
+        self.max_bytes = max_bytes
+        self.deadline = started + max_seconds
+        self.max_seconds = max_seconds
+        self.bytes_read = 0
+        self.extractor = StructuredDataExtractor()
+        self._decode = _decoder(headers.get('Content-Encoding'))
+        charset = _charset(headers.get('Content-Type'))
+        # No charset in the headers: hold the first bytes back until a <meta> one can be looked for
+        self._text = self._text_decoder(charset) if charset else None
+        self._head = b''
+        self._finished = False
+        self._decoded_bytes = 0
+        self._parts = []
+        self._tail = ''
+
+    def feed(self, raw):
+        self.bytes_read += len(raw)
+        if self.bytes_read > self.max_bytes:
+            raise BudgetExceeded('Page is larger than %d bytes' % self.max_bytes, 413)
+        if time.monotonic() > self.deadline:
+            raise too_slow(self.max_seconds)
+
+        for data in self._decode(raw):
+            # Compressed pages can inflate far past their wire size
+            self._decoded_bytes += len(data)
+            if self._decoded_bytes > self.max_bytes:
+                raise BudgetExceeded('Page is larger than %d bytes once decompressed' % self.max_bytes, 413)
+
+            if self._text is None:
+                self._head += data
+                if len(self._head) < CHARSET_SNIFF_BYTES:
+                    continue
+                data, self._head = self._head, b''
+                self._text = self._text_decoder(_sniff_charset(data))
+
+            text = self._text.decode(data)
+            self._parts.append(text)
+            if self.extractor.feed(text) is not None:
+                return True
+            window = (self._tail + text).lower()
+            self._tail = window[-6:]
+            if '</body' in window:
+                return True
+        return False
+
+    @staticmethod
+    def _text_decoder(charset):
+        return codecs.getincrementaldecoder(charset)(errors='replace')
+
+    def html(self):
+        self._finish()
+        return ''.join(self._parts)
+
+    def structured(self):
+        """``(recipe, extractor)``, or ``(None, None)`` once the page is known to have none."""
+        self._finish()
+        return self.extractor.recipe, self.extractor.extractor
+
+    def _finish(self):
+        if self._finished:
+            return
+        self._finished = True
+        if self._text is None:
+            # The whole body fit in the sniffing window
+            self._text = self._text_decoder(_sniff_charset(self._head))
+            text = self._text.decode(self._head, final=True)
+            self.extractor.feed(text)
+        else:
+            text = self._text.decode(b'', final=True)
+        self._parts.append(text)
+        # Reading stopped at </body> or the end of the page, so nothing more can turn up
+        self.extractor.close()
+
+
+def _read_body(response, reader):
+    """Feed ``response`` to ``reader`` until it has what it needs or the body ends."""
+    raw = response.raw
+    while True:
+        remaining = reader.deadline - time.monotonic()
+        if remaining <= 0:
+            raise too_slow(reader.max_seconds)
+        sock = getattr(raw.connection, 'sock', None)
+        if sock is not None:
+            # A stalled upstream can't wait out the budget on a single read
+            sock.settimeout(min(remaining, READ_TIMEOUT))
+        try:
+            # read1 returns whatever has arrived, so a server trickling a few
+            # bytes at a time can't hold us past the deadline waiting for a full chunk
+            data = raw.read1(CHUNK_SIZE, decode_content=False)
+        except ReadTimeoutError as e:
+            if time.monotonic() >= reader.deadline:
+                raise too_slow(reader.max_seconds)
+            raise requests.ReadTimeout(e)
+        if not data or reader.feed(data):
+            return
+
+
+def fetch_page(url, headers=None, max_bytes=MAX_PAGE_BYTES, max_seconds=MAX_FETCH_SECONDS):
+    """Download a recipe page, sending any conditional headers given.
+
+    The body is streamed and reading stops early once the recipe (or the end
+    of ``<body>``) has been seen. A 304 comes back as a Page with no html so
+    the caller can reuse whatever it already has cached.
+    """
+    request_headers = {'User-Agent': USER_AGENT, 'Accept-Encoding': ACCEPT_ENCODING}
+    request_headers.update(headers or {})
+    started = time.monotonic()
+    read_timeout = min(READ_TIMEOUT, max_seconds)
+    with requests.get(url, headers=request_headers, stream=True,
+                      timeout=(CONNECT_TIMEOUT, read_timeout)) as response:
+        ttfb_ms = round((time.monotonic() - started) * 1000, 1)
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        metrics.record_fetch(url, response.status_code)
+        if response.status_code == 304:
+            return Page(304, None, etag, last_modified, 0, ttfb_ms)
+        response.raise_for_status()
+
+        reader = BodyReader(response.headers, started, max_bytes, max_seconds)
+        try:
+            _read_body(response, reader)
+        finally:
+            metrics.record_bytes(url, reader.bytes_read)
+        return Page(response.status_code, reader.html(), etag, last_modified,
+                    reader.bytes_read, ttfb_ms, reader.structured())
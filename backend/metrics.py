@@ -0,0 +1,182 @@
+"""Per-request stage timings and Prometheus-style metrics for the parse pipeline."""
+import contextvars
+import cProfile
+import os
+import pstats
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Label values are bounded so one crawler can't blow up the series count
+MAX_DOMAINS = 500
+
+_timings = contextvars.ContextVar('recipeasy_timings', default=None)
+_domains = set()
+_domains_lock = threading.Lock()
+
+
+def domain_label(url):
+    domain = (urlsplit(url).hostname or '').lower()
+    if domain.startswith('www.'):
+        domain = domain[4:]
+    with _domains_lock:
+        if domain in _domains:
+            return domain
+        if len(_domains) < MAX_DOMAINS:
+            _domains.add(domain)
+            return domain
+    return 'other'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{%s}' % ','.join('%s="%s"' % (name, _escape(value)) for name, value in pairs)
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = ['# HELP %s %s' % (self.name, self.help), '# TYPE %s counter' % self.name]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append('%s%s %s' % (self.name, _labels(self.labels, labels), value))
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def render(self):
+        lines = ['# HELP %s %s' % (self.name, self.help), '# TYPE %s histogram' % self.name]
+        with self._lock:
+            for labels, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append('%s_bucket%s %d' % (self.name, _labels(self.labels, labels, [('le', le)]), cumulative))
+                lines.append('%s_sum%s %r' % (self.name, _labels(self.labels, labels), total))
+                lines.append('%s_count%s %d' % (self.name, _labels(self.labels, labels), cumulative))
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    'recipeasy_stage_seconds', 'Time spent in each parse pipeline stage.', ('stage', 'domain'))
+PARSE_SECONDS = Histogram(
+    'recipeasy_parse_seconds', 'End-to-end time to serve a parse.', ('domain', 'outcome'))
+UPSTREAM_RESPONSES = Counter(
+    'recipeasy_upstream_responses_total', 'Responses from recipe sites by status code.', ('domain', 'status'))
+UPSTREAM_BYTES = Counter(
+    'recipeasy_upstream_bytes_total', 'Bytes read from recipe sites.', ('domain',))
+PARSE_ERRORS = Counter(
+    'recipeasy_parse_errors_total', 'Failed parses by exception type.', ('domain', 'error'))
+
+REGISTRY = (STAGE_SECONDS, PARSE_SECONDS, UPSTREAM_RESPONSES, UPSTREAM_BYTES, PARSE_ERRORS)
+
+
+@contextmanager
+def collect():
+    """Collect stage timings (in seconds) for everything run inside the block."""
+    timings = {}
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+@contextmanager
+def stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = _timings.get()
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+
+def add_timings(timings):
+    """Merge timings collected elsewhere (e.g. in a worker process) into the current request."""
+    current = _timings.get()
+    if current is not None:
+        for name, value in timings.items():
+            current[name] = current.get(name, 0.0) + value
+
+
+def record_fetch(url, status):
+    UPSTREAM_RESPONSES.inc(domain_label(url), str(status))
+
+
+def record_bytes(url, bytes_read):
+    if bytes_read:
+        UPSTREAM_BYTES.inc(domain_label(url), amount=bytes_read)
+
+
+def record_parse(url, timings, seconds, outcome, error=None):
+    domain = domain_label(url)
+    for name, value in timings.items():
+        STAGE_SECONDS.observe(value, name, domain)
+    PARSE_SECONDS.observe(seconds, domain, outcome)
+    if error is not None:
+        PARSE_ERRORS.inc(domain, type(error).__name__)
+
+
+def render(cache_stats=None):
+    """Prometheus text exposition of every metric, plus parse cache counters."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    for name, value in sorted((cache_stats or {}).items()):
+        kind = 'gauge' if name == 'size' else 'counter'
+        metric = 'recipeasy_parse_cache_%s%s' % (name, '' if kind == 'gauge' else '_total')
+        lines.append('# TYPE %s %s' % (metric, kind))
+        lines.append('%s %s' % (metric, value))
+    return '\n'.join(lines) + '\n'
+
+
+def profile_call(fn, limit=30):
+    """Run ``fn()`` under cProfile; returns its result and the top functions by cumulative time."""
+    profiler = cProfile.Profile()
+    result = profiler.runcall(fn)
+    stats = pstats.Stats(profiler).stats
+    top = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return result, [{
+        'function': '%s:%d(%s)' % (os.path.basename(filename), line, name),
+        'calls': calls,
+        'total_ms': round(total * 1000, 3),
+        'cumulative_ms': round(cumulative * 1000, 3),
+    } for (filename, line, name), (_, calls, total, cumulative, _) in top]
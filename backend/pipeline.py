@@ -0,0 +1,147 @@
+import os
+import time
+
+import metrics
+from cache import ParseCache, normalize_url
+from classifier import classify_lines, split_lines
+from fetch import fetch_page
+from store import RecipeStore
+from structured import extract_structured
+
+MAX_SEARCH_RESULTS = 100
+# by_ingredients holds the store lock for time roughly linear in this, blocking /parse
+MAX_HAVE_INGREDIENTS = 50
+
+
+# A page with no schema.org data, so prewarm() goes through the newspaper path
+PREWARM_HTML = '''<html><head><title>Warm-up Soup</title></head><body><article>
+<h1>Warm-up Soup</h1>
+<p>A simple soup used to load the article parser before the first request arrives.</p>
+<p>2 cups vegetable stock</p>
+<p>1 onion, chopped</p>
+<p>Simmer the onion in the stock for ten minutes, then season to taste and serve hot.</p>
+</article></body></html>'''
+
+_article_config = None
+
+
+def _newspaper_config():
+    """Shared newspaper Config with the features we never use switched off.
+
+    newspaper pulls in nltk, PIL, jieba and friends at import time, so it is
+    only imported once a page without structured data needs it.
+    """
+    global _article_config
+    if _article_config is None:
+        from newspaper import Config
+
+        config = Config()
+        # Image scoring downloads every candidate image; we only want the text
+        config.fetch_images = False
+        config.follow_meta_refresh = False
+        config.keep_article_html = False
+        config.memoize_articles = False
+        config.language = 'en'
+        _article_config = config
+    return _article_config
+
+
+def prewarm():
+    """Import newspaper and load its language resources before serving."""
+    extract_recipe('https://recipeasy.invalid/prewarm', PREWARM_HTML)
+
+
+def extract_recipe(url, html, structured=None):
+    # Most recipe sites embed schema.org data; only fall back to newspaper without it
+    if structured is None:
+        with metrics.stage('structured'):
+            structured = extract_structured(html)
+    recipe, extractor = structured
+    if recipe is not None:
+        recipe['extractor'] = extractor
+        return recipe
+
+    with metrics.stage('article_parse'):
+        from newspaper import Article
+
+        article = Article(url, config=_newspaper_config())
+        article.download(input_html=html)
+        article.parse()
+    with metrics.stage('split'):
+        lines = split_lines(article.text)
+    with metrics.stage('classify'):
+        ingredients, steps = classify_lines(lines)
+
+    return {
+        'title': article.title,
+        'ingredients': ingredients,
+        'steps': steps,
+        'extractor': 'newspaper'
+    }
+
+
+def extract_in_worker(url, html, structured=None):
+    """extract_recipe for process pools: also returns the stage timings it collected."""
+    with metrics.collect() as timings:
+        result = extract_recipe(url, html, structured)
+    return result, timings
+
+
+def fetch_metadata(cache_status, page=None):
+    if page is None:
+        return {'cache': cache_status}
+    return {'cache': cache_status, 'bytes_read': page.bytes_read, 'ttfb_ms': page.ttfb_ms}
+
+
+def timed_parse(url, parse):
+    """Run ``parse()`` with stage timing, recording metrics for ``url``.
+
+    The returned result gains a ``timings_ms`` breakdown of this request.
+    """
+    started = time.perf_counter()
+    with metrics.collect() as timings:
+        try:
+            result = parse()
+        except Exception as e:
+            metrics.record_parse(url, timings, time.perf_counter() - started, 'error', e)
+            raise
+    metrics.record_parse(url, timings, time.perf_counter() - started, result['fetch']['cache'])
+    result['timings_ms'] = {name: round(value * 1000, 2) for name, value in timings.items()}
+    return result
+
+
+def cached_parse(cache, url, fetch=fetch_page, extract=extract_recipe):
+    """Parse ``url`` through ``cache``; the result's ``fetch`` key says how it was served."""
+    return timed_parse(url, lambda: _cached_parse(cache, url, fetch, extract))
+
+
+def _cached_parse(cache, url, fetch, extract):
+    key = normalize_url(url)
+    entry = cache.get(key)
+    if entry is not None and entry.is_fresh(cache.ttl):
+        return dict(entry.result, fetch=fetch_metadata('hit'))
+
+    # Stale or missing: a conditional GET lets an unchanged page skip the re-parse
+    with metrics.stage('download'):
+        page = fetch(url, entry.conditional_headers() if entry else None)
+    if page.status == 304 and entry is not None:
+        cache.revalidated(key, entry)
+        return dict(entry.result, fetch=fetch_metadata('revalidated', page))
+
+    result = extract(url, page.html, page.structured)
+    cache.put(key, result, page.etag, page.last_modified)
+    return dict(result, fetch=fetch_metadata('miss', page))
+
+
+def parse_cache_from_env():
+    """The ParseCache configured by RECIPEASY_CACHE_*, shared by the WSGI and ASGI apps."""
+    return ParseCache(
+        max_entries=int(os.environ.get('RECIPEASY_CACHE_SIZE', 1024)),
+        ttl=int(os.environ.get('RECIPEASY_CACHE_TTL', 3600)),
+        db_path=os.environ.get('RECIPEASY_CACHE_DB'),
+        db_max_entries=int(os.environ.get('RECIPEASY_CACHE_DB_SIZE', 100000)),
+    )
+
+
+def recipe_store_from_env():
+    return RecipeStore(os.environ.get('RECIPEASY_STORE_DB', 'recipes.db'))
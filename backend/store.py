@@ -0,0 +1,208 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+from array import array
+from collections import defaultdict
+
+from cache import normalize_url
+from classifier import ingredient_tokens
+
+_FTS_TERM = re.compile(r'\w+')
+
+# A token also gets a standing bitmap once it appears in 1/BITMAP_DENSITY of
+# recipes; rarer tokens keep just their id list and are turned into a bitmap
+# per query, which is cheap while the list is short
+BITMAP_DENSITY = 256
+BITMAP_MIN_POSTINGS = 4096
+
+
+def _bitmap(ids):
+    """Python int with bit ``id`` set for every recipe id in ``ids``."""
+    bits = bytearray(((max(ids) if ids else 0) >> 3) + 1)
+    for recipe_id in ids:
+        bits[recipe_id >> 3] |= 1 << (recipe_id & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def _match_counts(bitmaps):
+    """``exactly[m]``: bitmap of recipes in exactly ``m`` of ``bitmaps``, for m >= 1."""
+    # at_least[m] holds recipes seen in at least m of the bitmaps so far
+    at_least = [0] * (len(bitmaps) + 2)
+    for n, bitmap in enumerate(bitmaps, 1):
+        for m in range(n, 1, -1):
+            at_least[m] |= at_least[m - 1] & bitmap
+        at_least[1] |= bitmap
+    return {m: at_least[m] ^ at_least[m + 1] for m in range(1, len(bitmaps) + 1)}
+
+
+def _lowest_bits(bitmap, limit):
+    found = []
+    while bitmap and len(found) < limit:
+        lowest = bitmap & -bitmap
+        found.append(lowest.bit_length() - 1)
+        bitmap ^= lowest
+    return found
+
+
+class RecipeStore:
+    """Parsed recipes in SQLite, searchable by text and by ingredients.
+
+    Title, ingredient and step text go into an FTS5 table. Ingredient tokens
+    also feed an in-memory inverted index, rebuilt from the database on
+    start-up, that answers "what can I make with these" lookups without
+    scanning recipes.
+
+    Matching is done on bitmaps over recipe ids: common tokens keep one
+    standing, rarer ones are built from their id list per query, and
+    ``_by_size`` holds one bitmap per recipe token count. Counting how many
+    of the query's tokens each recipe has, and grouping by recipe size,
+    ranks recipes by coverage with a handful of big-int operations.
+    """
+
+    def __init__(self, db_path=':memory:'):
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._postings = defaultdict(lambda: array('L'))
+        self._bitmaps = {}
+        self._by_size = defaultdict(int)
+        self._recipe_count = 0
+        with self._conn:
+            self._conn.executescript(
+                'CREATE TABLE IF NOT EXISTS recipes ('
+                ' id INTEGER PRIMARY KEY, url TEXT NOT NULL UNIQUE, fingerprint TEXT NOT NULL,'
+                ' title TEXT, ingredients TEXT NOT NULL, steps TEXT NOT NULL,'
+                ' ingredient_count INTEGER NOT NULL, tokens TEXT NOT NULL);'
+                'CREATE INDEX IF NOT EXISTS recipes_fingerprint ON recipes (fingerprint);'
+                'CREATE VIRTUAL TABLE IF NOT EXISTS recipes_fts USING fts5('
+                ' title, ingredients, steps, tokenize="porter unicode61");')
+        self._load_index()
+
+    def _load_index(self):
+        rows = self._conn.execute('SELECT id, tokens FROM recipes ORDER BY id')
+        by_size = defaultdict(list)
+        for recipe_id, tokens in rows:
+            tokens = tokens.split()
+            by_size[len(tokens)].append(recipe_id)
+            for token in tokens:
+                self._postings[token].append(recipe_id)
+        self._recipe_count = sum(len(ids) for ids in by_size.values())
+        for size, ids in by_size.items():
+            self._by_size[size] = _bitmap(ids)
+        for token, postings in self._postings.items():
+            if self._wants_bitmap(postings):
+                self._bitmaps[token] = _bitmap(postings)
+
+    def _wants_bitmap(self, postings):
+        return len(postings) >= max(BITMAP_MIN_POSTINGS, self._recipe_count // BITMAP_DENSITY)
+
+    def _index(self, recipe_id, tokens):
+        bit = 1 << recipe_id
+        self._recipe_count += 1
+        self._by_size[len(tokens)] |= bit
+        for token in tokens:
+            postings = self._postings[token]
+            # Ids only grow, so appending keeps every list sorted
+            postings.append(recipe_id)
+            if token in self._bitmaps:
+                self._bitmaps[token] |= bit
+            elif self._wants_bitmap(postings):
+                self._bitmaps[token] = _bitmap(postings)
+
+    def add(self, url, recipe):
+        """Store a parsed recipe and return its id, reusing an existing one for duplicates."""
+        return self.add_many([(url, recipe)])[0]
+
+    def add_many(self, items):
+        ids = []
+        indexed = []
+        with self._lock:
+            with self._conn:
+                for url, recipe in items:
+                    recipe_id, tokens = self._insert(normalize_url(url), recipe)
+                    ids.append(recipe_id)
+                    if tokens is not None:
+                        indexed.append((recipe_id, tokens))
+            # Only index once the rows are committed
+            for recipe_id, tokens in indexed:
+                self._index(recipe_id, tokens)
+        return ids
+
+    def _insert(self, url, recipe):
+        ingredients = recipe.get('ingredients') or []
+        steps = recipe.get('steps') or []
+        fingerprint = hashlib.sha1(
+            json.dumps([recipe.get('title'), ingredients]).encode('utf-8')).hexdigest()
+        row = self._conn.execute(
+            'SELECT id FROM recipes WHERE url = ? OR fingerprint = ? LIMIT 1',
+            (url, fingerprint)).fetchone()
+        if row is not None:
+            return row[0], None
+
+        tokens = sorted({token for line in ingredients for token in ingredient_tokens(line)})
+        recipe_id = self._conn.execute(
+            'INSERT INTO recipes (url, fingerprint, title, ingredients, steps, ingredient_count, tokens)'
+            ' VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (url, fingerprint, recipe.get('title'), json.dumps(ingredients), json.dumps(steps),
+             len(ingredients), ' '.join(tokens))).lastrowid
+        self._conn.execute(
+            'INSERT INTO recipes_fts (rowid, title, ingredients, steps) VALUES (?, ?, ?, ?)',
+            (recipe_id, recipe.get('title') or '', '\n'.join(ingredients), '\n'.join(steps)))
+        return recipe_id, tokens
+
+    def search(self, query, limit=20):
+        """Full-text search over title, ingredients and steps, best match first."""
+        # Quote every term so user input can't use (or break on) FTS5 query syntax
+        terms = ' '.join('"%s"' % term for term in _FTS_TERM.findall(query))
+        if not terms:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT r.id, r.url, r.title FROM recipes_fts JOIN recipes r ON r.id = recipes_fts.rowid'
+                ' WHERE recipes_fts MATCH ? ORDER BY bm25(recipes_fts, 10.0, 2.0, 1.0) LIMIT ?',
+                (terms, limit)).fetchall()
+        return [{'id': row[0], 'url': row[1], 'title': row[2]} for row in rows]
+
+    def _match(self, tokens, limit):
+        """Up to ``limit`` ``(recipe_id, matched, size)``, best coverage first."""
+        bitmaps = [self._bitmaps.get(token) or _bitmap(self._postings[token]) for token in tokens]
+        exactly = _match_counts(bitmaps)
+        # Coverage is matched / size; ties go to the recipe using more of the query
+        groups = sorted(((matched, size) for matched in exactly for size in self._by_size if size >= matched),
+                        key=lambda group: (-group[0] / group[1], -group[0]))
+        found = []
+        for matched, size in groups:
+            ids = _lowest_bits(exactly[matched] & self._by_size[size], limit - len(found))
+            found.extend((recipe_id, matched, size) for recipe_id in ids)
+            if len(found) == limit:
+                break
+        return found
+
+    def by_ingredients(self, have, limit=20):
+        """Recipes that can be made with (or come closest to) ``have``.
+
+        Recipes sharing any ingredient with ``have`` are ranked by coverage,
+        the share of their ingredient tokens the caller named, so those
+        needing the fewest extra ingredients come first.
+        """
+        tokens = sorted({token for item in have for token in ingredient_tokens(item)})
+        with self._lock:
+            tokens = [token for token in tokens if self._postings.get(token)]
+            if not tokens:
+                return []
+            matches = self._match(tokens, limit)
+            if not matches:
+                return []
+            ids = [recipe_id for recipe_id, _, _ in matches]
+            rows = self._conn.execute(
+                'SELECT id, url, title FROM recipes WHERE id IN (%s)' % ','.join('?' * len(ids)),
+                ids).fetchall()
+        found = {row[0]: row for row in rows}
+        return [{
+            'id': recipe_id,
+            'url': found[recipe_id][1],
+            'title': found[recipe_id][2],
+            'coverage': round(matched / size, 3),
+            'missing': size - matched,
+        } for recipe_id, matched, size in matches]
@@ -0,0 +1,166 @@
+import html
+import json
+
+from lxml import etree
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _is_recipe_type(value):
+    if isinstance(value, list):
+        return any(_is_recipe_type(item) for item in value)
+    return isinstance(value, str) and value.rsplit('/', 1)[-1] == 'Recipe'
+
+
+def _find_recipe(node):
+    """Depth-first search of a JSON-LD document for a Recipe object."""
+    if isinstance(node, list):
+        for item in node:
+            found = _find_recipe(item)
+            if found is not None:
+                return found
+    elif isinstance(node, dict):
+        if _is_recipe_type(node.get('@type')):
+            return node
+        for key in ('@graph', 'mainEntity', 'mainEntityOfPage'):
+            found = _find_recipe(node.get(key))
+            if found is not None:
+                return found
+    return None
+
+
+def _clean(text):
+    if not isinstance(text, str):
+        return ''
+    # Some sites put HTML markup or entities inside JSON-LD strings
+    if '<' in text:
+        try:
+            text = ''.join(etree.fromstring('<x>%s</x>' % text, etree.HTMLParser()).itertext())
+        except (etree.ParserError, TypeError, ValueError):
+            pass
+    return ' '.join(html.unescape(text).split())
+
+
+def _instruction_lines(node):
+    if isinstance(node, str):
+        return [line for line in (_clean(part) for part in node.split('\n')) if line]
+    if isinstance(node, list):
+        return [line for item in node for line in _instruction_lines(item)]
+    if isinstance(node, dict):
+        # HowToSection nests its HowToSteps under itemListElement
+        if 'itemListElement' in node:
+            return _instruction_lines(node['itemListElement'])
+        return _instruction_lines(node.get('text') or node.get('name'))
+    return []
+
+
+def recipe_from_json_ld(recipe):
+    ingredients = recipe.get('recipeIngredient') or recipe.get('ingredients') or []
+    if isinstance(ingredients, str):
+        ingredients = [ingredients]
+    name = recipe.get('name')
+    return {
+        'title': _clean(name[0] if isinstance(name, list) and name else name),
+        'ingredients': [line for line in map(_clean, ingredients) if line],
+        'steps': _instruction_lines(recipe.get('recipeInstructions')),
+    }
+
+
+def _text(element):
+    return ' '.join(''.join(element.itertext()).split())
+
+
+class StructuredDataExtractor:
+    """Pull a schema.org Recipe out of HTML as it is fed in.
+
+    Looks for ``application/ld+json`` blocks and ``itemtype=.../Recipe``
+    microdata using lxml's incremental parser, so the caller can stop
+    feeding the page as soon as ``recipe`` is set.
+    """
+
+    def __init__(self):
+        self._parser = etree.HTMLPullParser(events=('start', 'end'))
+        self._scope = None
+        self._microdata = None
+        self.recipe = None
+        self.extractor = None
+
+    def feed(self, data):
+        """Feed a chunk of HTML; returns the recipe once one has been found."""
+        if self.recipe is None:
+            self._parser.feed(data)
+            self._handle_events()
+        return self.recipe
+
+    def close(self):
+        if self.recipe is None:
+            try:
+                self._parser.close()
+            except etree.LxmlError:
+                pass
+            self._handle_events()
+        return self.recipe
+
+    def _handle_events(self):
+        for event, element in self._parser.read_events():
+            if not isinstance(element.tag, str):
+                continue
+            if event == 'start':
+                if self._scope is None and 'itemscope' in element.attrib \
+                        and _is_recipe_type(element.get('itemtype', '').strip()):
+                    self._scope = element
+                    self._microdata = {'title': '', 'ingredients': [], 'steps': []}
+            elif element.tag == 'script':
+                if 'ld+json' in element.get('type', ''):
+                    self._handle_json_ld(element.text)
+            elif self._scope is not None:
+                self._handle_microdata(element)
+            if self.recipe is not None:
+                return
+
+    def _handle_json_ld(self, text):
+        try:
+            recipe = _find_recipe(json.loads(text or ''))
+        except ValueError:
+            return
+        if recipe is not None:
+            self._finish(recipe_from_json_ld(recipe), 'json-ld')
+
+    def _handle_microdata(self, element):
+        if element is self._scope:
+            if self._microdata['ingredients'] or self._microdata['steps']:
+                self._finish(self._microdata, 'microdata')
+            self._scope = self._microdata = None
+            return
+        props = element.get('itemprop', '').split()
+        if not props or self._owning_scope(element) is not self._scope:
+            return
+        if 'name' in props and not self._microdata['title']:
+            self._microdata['title'] = _text(element)
+        elif 'recipeIngredient' in props or 'ingredients' in props:
+            self._microdata['ingredients'].append(_text(element))
+        elif 'recipeInstructions' in props:
+            items = element.findall('.//li') or [element]
+            self._microdata['steps'].extend(line for line in map(_text, items) if line)
+
+    def _owning_scope(self, element):
+        parent = element.getparent()
+        while parent is not None and 'itemscope' not in parent.attrib:
+            parent = parent.getparent()
+        return parent
+
+    def _finish(self, recipe, extractor):
+        if recipe['ingredients'] or recipe['steps']:
+            self.recipe = recipe
+            self.extractor = extractor
+
+
+def extract_structured(html_text):
+    """Return ``(recipe, extractor)`` from embedded schema.org data, or ``(None, None)``."""
+    extractor = StructuredDataExtractor()
+    for start in range(0, len(html_text), CHUNK_SIZE):
+        if extractor.feed(html_text[start:start + CHUNK_SIZE]) is not None:
+            break
+    else:
+        extractor.close()
+    return extractor.recipe, extractor.extractor